@@ -5,10 +5,16 @@ then create problem instances and solve them with calls to the various search
 functions."""
 
 from .utils import (
-    is_in, memoize, print_table, Stack, FIFOQueue, PriorityQueue, name
+    is_in, memoize, print_table, Stack, FIFOQueue, PriorityQueue,
+    IndexedPriorityQueue, name
 )
 
+import collections
+import functools
+import heapq
+import random
 import sys
+from time import perf_counter
 
 infinity = float('inf')
 
@@ -65,6 +71,33 @@ class Problem:
         """For optimization problems, each state has a value.  Hill-climbing
         and related algorithms try to maximize this value."""
         raise NotImplementedError
+
+    # The following methods are only needed for searches that regress from
+    # the goal, such as bidirectional_search.  A partial state describes a
+    # set of states, e.g. the set of goal states.
+
+    def regression_goal(self):
+        """Return the goal as a partial state."""
+        raise NotImplementedError
+
+    def relevant_actions(self, partial):
+        """Return the actions that could be the last step of a path to a
+        state described by partial."""
+        raise NotImplementedError
+
+    def regress(self, partial, action):
+        """Return the partial state describing the states from which action
+        leads to a state described by partial, or None if there are none."""
+        raise NotImplementedError
+
+    def satisfies(self, state, partial):
+        """Return True if state is one of those described by partial."""
+        raise NotImplementedError
+
+    def subsumes(self, partial1, partial2):
+        """Return True if every state described by partial2 is also described
+        by partial1."""
+        raise NotImplementedError
 # ______________________________________________________________________________
 
 
@@ -147,20 +180,33 @@ def tree_search(problem, frontier):
     return None
 
 
-def graph_search(problem, frontier):
+def graph_search(problem, frontier, duplicate_check='push'):
     """Search through the successors of a problem to find a goal.
     The argument frontier should be an empty queue.
-    If two paths reach a state, only use the first one. [Figure 3.7]"""
+    If two paths reach a state, only use the first one. [Figure 3.7]
+    With duplicate_check='push' (the default) a child is not added if its
+    state is explored or already in the frontier; with 'pop' every
+    unexplored child is added and duplicates are skipped when popped,
+    which saves the frontier membership test at the cost of a larger
+    frontier."""
+    if duplicate_check not in ('push', 'pop'):
+        raise ValueError("duplicate_check must be 'push' or 'pop'")
     frontier.append(Node(problem.initial))
     explored = set()
     while frontier:
         node = frontier.pop()
+        if node.state in explored:
+            continue
         if problem.goal_test(node.state):
             return node
         explored.add(node.state)
-        frontier.extend(child for child in node.expand(problem)
-                        if child.state not in explored and
-                        child not in frontier)
+        if duplicate_check == 'push':
+            frontier.extend(child for child in node.expand(problem)
+                            if child.state not in explored and
+                            child not in frontier)
+        else:
+            frontier.extend(child for child in node.expand(problem)
+                            if child.state not in explored)
     return None
 
 
@@ -174,9 +220,10 @@ def depth_first_tree_search(problem):
     return tree_search(problem, Stack())
 
 
-def depth_first_graph_search(problem):
-    "Search the deepest nodes in the search tree first."
-    return graph_search(problem, Stack())
+def depth_first_graph_search(problem, duplicate_check='push'):
+    """Search the deepest nodes in the search tree first.
+    duplicate_check is 'push' or 'pop'; see graph_search."""
+    return graph_search(problem, Stack(), duplicate_check)
 
 
 def breadth_first_search(problem):
@@ -210,7 +257,7 @@ def best_first_graph_search(problem, f):
     node = Node(problem.initial)
     if problem.goal_test(node.state):
         return node
-    frontier = PriorityQueue(min, f)
+    frontier = IndexedPriorityQueue(min, f)
     frontier.append(node)
     explored = set()
     while frontier:
@@ -219,13 +266,12 @@ def best_first_graph_search(problem, f):
             return node
         explored.add(node.state)
         for child in node.expand(problem):
-            if child.state not in explored and child not in frontier:
+            if child.state in explored:
+                continue
+            if child not in frontier:
                 frontier.append(child)
-            elif child in frontier:
-                incumbent = frontier[child]
-                if f(child) < f(incumbent):
-                    # del frontier[incumbent]
-                    frontier.append(child)
+            elif f(child) < f(frontier[child]):
+                frontier.update(child)
     return None
 
 
@@ -269,13 +315,110 @@ greedy_best_first_graph_search = best_first_graph_search
 # Greedy best-first search is accomplished by specifying f(n) = h(n).
 
 
+def deferred_greedy_best_first_graph_search(problem, h=None, preferred=None):
+    """Greedy best-first search with deferred heuristic evaluation.
+    Children are queued with their parent's h value, and a node's own h is
+    only computed when it is popped for expansion; most generated children
+    are never popped, so they never pay for a heuristic call.
+    If preferred is given, it is a function preferred(state) returning the
+    preferred (e.g. helpful) actions in a state; children reached by them
+    are also put in a second queue, and the two queues are popped in turn."""
+    h = h or problem.h
+    node = Node(problem.initial)
+    node.parent_h = 0
+    frontiers = [PriorityQueue(min, lambda n: n.parent_h)]
+    if preferred is not None:
+        frontiers.append(PriorityQueue(min, lambda n: n.parent_h))
+    frontiers[0].append(node)
+    explored = set()
+    turn = 0
+    while any(frontiers):
+        frontier = frontiers[turn % len(frontiers)]
+        turn += 1
+        if not frontier:
+            continue
+        node = frontier.pop()
+        if node.state in explored:
+            continue
+        if problem.goal_test(node.state):
+            return node
+        explored.add(node.state)
+        node.h = h(node)
+        if node.h == infinity:
+            continue
+        helpful = set(preferred(node.state)) if preferred is not None else ()
+        for child in node.expand(problem):
+            if child.state in explored:
+                continue
+            child.parent_h = node.h
+            frontiers[0].append(child)
+            if child.action in helpful:
+                frontiers[1].append(child)
+    return None
+
+
 def astar_search(problem, h=None):
     """A* search is best-first graph search with f(n) = g(n)+h(n).
     You need to specify the h function when you call astar_search, or
-    else in your Problem subclass."""
+    else in your Problem subclass. If h is a list of heuristics, they are
+    evaluated lazily; see lazy_astar_search."""
+    if isinstance(h, (list, tuple)):
+        return lazy_astar_search(problem, h)
     h = memoize(h or problem.h, 'h')
     return best_first_graph_search(problem, lambda n: n.path_cost + h(n))
 
+
+def lazy_astar_search(problem, heuristics, stats=None):
+    """A* search with several admissible heuristics, listed from the cheapest
+    to the most expensive, and f(n) = g(n) + the max of those evaluated so far.
+    Children enter the frontier scored by the first heuristic only. When a
+    node reaches the top of the frontier the next heuristic is computed; if
+    that raises f above the rest of the frontier the node is re-inserted with
+    the stronger bound instead of being expanded. Expensive heuristics are
+    therefore only paid for on nodes that were about to be expanded.
+    If stats is a dict, it is filled with the number of evaluations of each
+    heuristic, by name."""
+    heuristics = list(heuristics)
+    counts = stats if stats is not None else {}
+    for h in heuristics:
+        counts.setdefault(name(h), 0)
+
+    def evaluate(node, level):
+        h = heuristics[level]
+        counts[name(h)] += 1
+        node.h = max(getattr(node, 'h', 0), h(node))
+        node.h_level = level
+        node.f = node.path_cost + node.h
+
+    node = Node(problem.initial)
+    evaluate(node, 0)
+    frontier = PriorityQueue(min, lambda n: n.f)
+    frontier.append(node)
+    best_g = {node.state: node.path_cost}
+    explored = set()
+    while frontier:
+        node = frontier.pop()
+        if node.state in explored or node.path_cost > best_g[node.state]:
+            continue
+        if problem.goal_test(node.state):
+            return node
+        while node.h_level + 1 < len(heuristics):
+            evaluate(node, node.h_level + 1)
+            if frontier and node.f > frontier.A[0][0]:
+                break
+        if frontier and node.f > frontier.A[0][0]:
+            frontier.append(node)
+            continue
+        explored.add(node.state)
+        for child in node.expand(problem):
+            if child.state in explored:
+                continue
+            if child.path_cost < best_g.get(child.state, infinity):
+                best_g[child.state] = child.path_cost
+                evaluate(child, 0)
+                frontier.append(child)
+    return None
+
 # ______________________________________________________________________________
 # Other search algorithms
 
@@ -311,31 +454,347 @@ def recursive_best_first_search(problem, h=None):
     result, bestf = RBFS(problem, node, infinity)
     return result
 
+
+class TranspositionTable:
+
+    """A fixed-size hash table recording, for each state, the best path cost
+    g it was reached with, its heuristic value h and the search iteration of
+    that visit. Each state maps to a single slot; when two states collide the
+    replacement policy decides which one is kept:
+        'shallow' -- keep the entry with the smaller g, unless it is left
+                     over from an earlier iteration (the default)
+        'always'  -- the newest entry always wins
+    Memory use is bounded by the number of slots."""
+
+    def __init__(self, size=2**16, replacement='shallow'):
+        if replacement not in ('shallow', 'always'):
+            raise ValueError("Unknown replacement policy: {!r}".format(replacement))
+        self.size = size
+        self.replacement = replacement
+        self.slots = [None] * size
+        self.hits = self.misses = self.replacements = 0
+
+    def lookup(self, state):
+        "Return the (state, g, h, iteration) entry for state, or None."
+        entry = self.slots[hash(state) % self.size]
+        if entry is not None and entry[0] == state:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, state, g, h, iteration):
+        i = hash(state) % self.size
+        entry = self.slots[i]
+        if entry is not None and entry[0] != state:
+            if (self.replacement == 'shallow' and entry[3] == iteration and
+                    entry[1] < g):
+                return
+            self.replacements += 1
+        self.slots[i] = (state, g, h, iteration)
+
+
+def iterative_deepening_astar_search(problem, h=None, table_size=2**16,
+                                     replacement='shallow'):
+    """IDA* search: repeated depth-first searches bounded by f = g + h, each
+    with the bound raised to the smallest f that exceeded it last time.
+    The depth-first search keeps an explicit stack, so it is not limited by
+    Python's recursion limit. A TranspositionTable of table_size slots caches
+    h for each state, and prunes a node whose state was already reached in
+    the same iteration with a path no more costly. The solution is optimal
+    for an admissible h, with memory bounded by the table and the stack."""
+    h = h or problem.h
+    table = TranspositionTable(table_size, replacement)
+    root = Node(problem.initial)
+    root.h = h(root)
+    bound = root.h
+    iteration = 0
+    while bound < infinity:
+        iteration += 1
+        next_bound = infinity
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            entry = table.lookup(node.state)
+            if entry is not None:
+                if entry[3] == iteration and entry[1] <= node.path_cost:
+                    continue
+                node.h = entry[2]
+            elif not hasattr(node, 'h'):
+                node.h = h(node)
+            f = node.path_cost + node.h
+            if f > bound:
+                next_bound = min(next_bound, f)
+                continue
+            if problem.goal_test(node.state):
+                return node
+            table.store(node.state, node.path_cost, node.h, iteration)
+            stack.extend(reversed(node.expand(problem)))
+        bound = next_bound
+    return None
+
+
+def bidirectional_search(problem):
+    """Breadth-first search forward from the initial state and backward from
+    the goal at the same time, expanding a whole layer of whichever frontier
+    is smaller, until a forward state satisfies a backward partial state.
+    The backward search regresses partial states (sets of required fluents)
+    through the problem's relevant actions, and drops a regressed partial
+    state when one already reached subsumes it.  Every meeting pair is
+    checked when a layer is added, so with unit action costs the plan found
+    is a shortest one.  The problem must implement the regression methods of
+    Problem (regression_goal, relevant_actions, regress, satisfies and
+    subsumes)."""
+    start = Node(problem.initial)
+    if problem.goal_test(start.state):
+        return start
+    goal = Node(problem.regression_goal())
+    forward = {start.state: start}
+    backward = {goal.state: goal}
+    f_layer, b_layer = [start], [goal]
+    while f_layer and b_layer:
+        meets = []
+        if len(f_layer) <= len(b_layer):
+            new_layer = []
+            for node in f_layer:
+                for child in node.expand(problem):
+                    if child.state not in forward:
+                        forward[child.state] = child
+                        new_layer.append(child)
+            for child in new_layer:
+                meets.extend((child, b) for b in backward.values()
+                             if problem.satisfies(child.state, b.state))
+            f_layer = new_layer
+        else:
+            new_layer = []
+            for node in b_layer:
+                for action in problem.relevant_actions(node.state):
+                    partial = problem.regress(node.state, action)
+                    if partial is None or partial in backward:
+                        continue
+                    if any(problem.subsumes(other, partial) for other in backward):
+                        continue
+                    child = Node(partial, node, action, node.path_cost + 1)
+                    backward[partial] = child
+                    new_layer.append(child)
+            for child in new_layer:
+                meets.extend((f, child) for f in forward.values()
+                             if problem.satisfies(f.state, child.state))
+            b_layer = new_layer
+        if meets:
+            node, b = min(meets, key=lambda m: m[0].depth + m[1].depth)
+            while b.parent is not None:
+                node = node.child_node(problem, b.action)
+                b = b.parent
+            return node
+    return None
+
+
+def anytime_weighted_astar_search(problem, h=None, weight=5.0, decrement=1.0,
+                                  time_limit=None):
+    """Anytime Repairing A* (ARA*).  A generator yielding (node, bound) each
+    time a better solution is found, where node is the goal node and bound
+    is an upper bound on the ratio of its cost to the optimal cost.
+    The search starts as weighted A* with f = g + weight*h, which finds a
+    plan quickly, then repeatedly lowers the weight by decrement (down to 1)
+    and repairs the previous search, re-using its frontier and its g values
+    rather than starting again.  States whose g improves after they were
+    expanded are kept aside and only re-opened for the next weight.
+    With time_limit (in seconds) the search stops once the time is used up,
+    after yielding the best plan it found."""
+    h = memoize(h or problem.h, 'h')
+    deadline = None if time_limit is None else perf_counter() + time_limit
+    root = Node(problem.initial)
+    if problem.goal_test(root.state):
+        yield root, 1.0
+        return
+    best = {root.state: root}
+    incumbent = reported = None
+    reported_bound = infinity
+    incons = {}
+    w = max(weight, 1.0)
+    frontier = IndexedPriorityQueue(min, lambda n: n.path_cost + w * h(n))
+    frontier.append(root)
+    while True:
+        closed = set()
+        while frontier and (incumbent is None or
+                            incumbent.path_cost > frontier.peek()[0]):
+            if deadline is not None and perf_counter() > deadline:
+                return
+            node = frontier.pop()
+            closed.add(node.state)
+            for child in node.expand(problem):
+                old = best.get(child.state)
+                if old is not None and old.path_cost <= child.path_cost:
+                    continue
+                best[child.state] = child
+                if problem.goal_test(child.state):
+                    if incumbent is None or child.path_cost < incumbent.path_cost:
+                        incumbent = child
+                elif child.state in closed:
+                    incons[child.state] = child
+                elif child in frontier:
+                    frontier.update(child)
+                else:
+                    frontier.append(child)
+        if incumbent is None:
+            return
+        lower = min([n.path_cost + h(n) for n in frontier.index] +
+                    [n.path_cost + h(n) for n in incons.values()] +
+                    [incumbent.path_cost])
+        bound = min(w, incumbent.path_cost / lower) if lower > 0 else 1.0
+        if incumbent is not reported or bound < reported_bound:
+            reported, reported_bound = incumbent, bound
+            yield incumbent, bound
+        if w <= 1.0 or bound <= 1.0:
+            return
+        w = max(1.0, w - decrement)
+        # Re-key the frontier for the new weight, adding the inconsistent
+        # states.
+        nodes = list(frontier.index) + list(incons.values())
+        incons = {}
+        frontier = IndexedPriorityQueue(min, lambda n: n.path_cost + w * h(n))
+        for node in nodes:
+            frontier.append(node)
+
+
+def arastar_search(problem, h=None, weight=5.0, decrement=1.0, time_limit=None):
+    """Run anytime_weighted_astar_search and return the best solution found
+    within time_limit (the optimal one if there is time enough), or None if
+    no solution was found in time."""
+    node = None
+    for node, bound in anytime_weighted_astar_search(problem, h, weight,
+                                                     decrement, time_limit):
+        pass
+    return node
+
+
+def enforced_hill_climbing_search(problem, h=None):
+    """Enforced hill-climbing: from the current node, search breadth-first
+    for the nearest node with a strictly lower h (or a goal), jump to it,
+    and repeat.  Memory is limited to one breadth-first plateau search at a
+    time.  If a plateau search runs out of nodes (a dead end), fall back to
+    greedy best-first search from the initial state."""
+    h = memoize(h or problem.h, 'h')
+    node = Node(problem.initial)
+    while not problem.goal_test(node.state):
+        better = None
+        frontier = FIFOQueue()
+        frontier.append(node)
+        seen = {node.state}
+        while frontier and better is None:
+            for child in frontier.pop().expand(problem):
+                if child.state in seen:
+                    continue
+                seen.add(child.state)
+                if problem.goal_test(child.state) or h(child) < h(node):
+                    better = child
+                    break
+                frontier.append(child)
+        if better is None:
+            return greedy_best_first_graph_search(problem, h)
+        node = better
+    return node
+
+
+def beam_search(problem, h=None, width=100, max_depth=1000):
+    """Breadth-first search that keeps only the width nodes with the lowest h
+    in each layer.  Duplicates are only detected against the current and the
+    previous layer, so memory is O(width) (times the branching factor), but
+    the beam may cycle; the search gives up after max_depth layers.
+    Incomplete: returns None if the beam empties or reaches max_depth without
+    reaching a goal."""
+    h = memoize(h or problem.h, 'h')
+    node = Node(problem.initial)
+    if problem.goal_test(node.state):
+        return node
+    layer = [node]
+    previous = set()
+    while layer and layer[0].depth < max_depth:
+        current = set(n.state for n in layer)
+        children = []
+        for node in layer:
+            for child in node.expand(problem):
+                if child.state in current or child.state in previous:
+                    continue
+                if problem.goal_test(child.state):
+                    return child
+                current.add(child.state)
+                children.append(child)
+        previous = set(n.state for n in layer)
+        layer = heapq.nsmallest(width, children, key=h)
+    return None
+
 # ______________________________________________________________________________
 
 # Code to compare searchers on various problems.
 
 
+class CallStats:
+
+    """Call count, cumulative time and latency percentiles of one instrumented
+    function. Latencies are kept in a fixed-size reservoir sample, so memory
+    stays bounded however many calls are recorded."""
+
+    def __init__(self, sample_size=1024):
+        self.calls = 0
+        self.total = 0.0
+        self.sample_size = sample_size
+        self.samples = []
+
+    def record(self, elapsed):
+        self.calls += 1
+        self.total += elapsed
+        if len(self.samples) < self.sample_size:
+            self.samples.append(elapsed)
+        else:
+            i = int(random.random() * self.calls)
+            if i < self.sample_size:
+                self.samples[i] = elapsed
+
+    def mean(self):
+        return self.total / self.calls if self.calls else 0.0
+
+    def percentile(self, p):
+        "Approximate p-th percentile (0 <= p <= 100) of the latency, in seconds."
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
 class InstrumentedProblem(Problem):
 
-    """Delegates to a problem, and keeps statistics."""
+    """Delegates to a problem, and keeps statistics: counts of expansions,
+    goal tests and generated states, and the time spent in actions, result,
+    goal_test and any heuristic wrapped with instrument."""
 
     def __init__(self, problem):
         self.problem = problem
         self.succs = self.goal_tests = self.states = 0
         self.found = None
+        self.timings = collections.OrderedDict(
+            (fn, CallStats()) for fn in ('actions', 'result', 'goal_test'))
 
     def actions(self, state):
         self.succs += 1
-        return self.problem.actions(state)
+        start = perf_counter()
+        actions = self.problem.actions(state)
+        self.timings['actions'].record(perf_counter() - start)
+        return actions
 
     def result(self, state, action):
         self.states += 1
-        return self.problem.result(state, action)
+        start = perf_counter()
+        result = self.problem.result(state, action)
+        self.timings['result'].record(perf_counter() - start)
+        return result
 
     def goal_test(self, state):
         self.goal_tests += 1
+        start = perf_counter()
         result = self.problem.goal_test(state)
+        self.timings['goal_test'].record(perf_counter() - start)
         if result:
             self.found = state
         return result
@@ -346,6 +805,62 @@ class InstrumentedProblem(Problem):
     def value(self, state):
         return self.problem.value(state)
 
+    def regression_goal(self):
+        return self.problem.regression_goal()
+
+    def relevant_actions(self, partial):
+        self.succs += 1
+        return self.problem.relevant_actions(partial)
+
+    def regress(self, partial, action):
+        self.states += 1
+        return self.problem.regress(partial, action)
+
+    def satisfies(self, state, partial):
+        return self.problem.satisfies(state, partial)
+
+    def subsumes(self, partial1, partial2):
+        return self.problem.subsumes(partial1, partial2)
+
+    def instrument(self, h):
+        """Return a version of the heuristic h that records its calls and
+        latency under its name. Lists of heuristics are wrapped element-wise."""
+        if isinstance(h, (list, tuple)):
+            return [self.instrument(each) for each in h]
+        stats = self.timings.setdefault(name(h), CallStats())
+
+        @functools.wraps(h)
+        def timed_h(node):
+            start = perf_counter()
+            value = h(node)
+            stats.record(perf_counter() - start)
+            return value
+
+        return timed_h
+
+    def timing_table(self):
+        """Return rows of [function, calls, total s, mean us, p50 us, p90 us,
+        p99 us], one for each instrumented function that was called."""
+        rows = []
+        for fn, stats in self.timings.items():
+            if stats.calls:
+                rows.append([fn, stats.calls, stats.total, stats.mean() * 1e6] +
+                            [stats.percentile(p) * 1e6 for p in (50, 90, 99)])
+        return rows
+
+    def print_timings(self):
+        "Print the per-function breakdown and the heuristic cache hit ratio."
+        header = ['Function', 'Calls', 'Total s', 'Mean us',
+                  'p50 us', 'p90 us', 'p99 us']
+        table = self.timing_table()
+        if table:
+            print_table(table, header, numfmt='{:.4g}')
+        cache = getattr(self.problem, 'h_cache', None)
+        if cache is not None and cache.hits + cache.misses:
+            print("Heuristic cache: {} hits, {} misses, {} evictions, "
+                  "hit ratio {:.1%}".format(cache.hits, cache.misses,
+                                            cache.evictions, cache.hit_ratio()))
+
     def __getattr__(self, attr):
         return getattr(self.problem, attr)
 
@@ -10,7 +10,7 @@ import random
 import math
 
 import heapq
-from collections import defaultdict
+import itertools
 
 # ______________________________________________________________________________
 # Functions on Sequences and Iterables
@@ -294,6 +294,132 @@ def memoize(fn, slot=None):
     return memoized_fn
 
 
+class HeuristicCache:
+    """A bounded cache of heuristic values, keyed by compact state.
+
+    Unlike functools.lru_cache on a method, the cache belongs to a single
+    problem instance and holds no references to search nodes, so finished
+    problems and their search trees can be garbage collected.
+    policy is either 'lru' (evict the least recently used entry) or 'clock'
+    (second-chance eviction; a hit only sets a reference bit, which makes
+    lookups cheaper than moving entries about in an ordered dict).
+    Counters hits, misses and evictions are kept for reporting.
+    An optional backing store (any object with get(key) and put(key, value)
+    methods, such as lp_utils.HeuristicStore) is consulted on a miss and
+    written through on store, so values can outlive the process."""
+
+    def __init__(self, maxsize=8192, policy='lru', backing=None):
+        if policy not in ('lru', 'clock'):
+            raise ValueError("Unknown cache policy: {!r}".format(policy))
+        self.maxsize = maxsize
+        self.policy = policy
+        self.backing = backing
+        self.hits = self.misses = self.evictions = self.backing_hits = 0
+        self.data = collections.OrderedDict()
+        self.referenced = {}
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def lookup(self, key, default=None):
+        """Return the cached value for key, or default, counting a hit or a
+        miss."""
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            if self.backing is not None:
+                value = self.backing.get(key)
+                if value is not None:
+                    self.backing_hits += 1
+                    self.insert(key, value)
+                    return value
+            return default
+        self.hits += 1
+        if self.policy == 'lru':
+            self.data.move_to_end(key)
+        else:
+            self.referenced[key] = True
+        return value
+
+    def store(self, key, value):
+        """Cache value under key, evicting an entry if the cache is full,
+        and write it through to the backing store."""
+        if self.backing is not None:
+            self.backing.put(key, value)
+        return self.insert(key, value)
+
+    def insert(self, key, value):
+        if key not in self.data:
+            if self.maxsize is not None and len(self.data) >= self.maxsize:
+                self.evict()
+            self.referenced[key] = False
+        self.data[key] = value
+        return value
+
+    def evict(self):
+        "Remove one entry according to the eviction policy."
+        if not self.data:
+            return
+        if self.policy == 'lru':
+            key, _ = self.data.popitem(last=False)
+        else:
+            # Second-chance sweep from the oldest entry: referenced entries
+            # have their bit cleared and go to the back, like a clock hand
+            # passing over them.
+            for key in self.data:
+                if not self.referenced[key]:
+                    break
+                self.referenced[key] = False
+            else:
+                key = next(iter(self.data))
+            for k in list(itertools.takewhile(lambda k: k != key, self.data)):
+                self.data.move_to_end(k)
+            del self.data[key]
+        del self.referenced[key]
+        self.evictions += 1
+
+    def clear(self):
+        self.data.clear()
+        self.referenced.clear()
+
+    def flush(self):
+        "Write any values pending in the backing store."
+        if self.backing is not None:
+            self.backing.flush()
+
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __repr__(self):
+        return '<HeuristicCache {}/{} {} hits={} misses={} evictions={}>'.format(
+            len(self.data), self.maxsize, self.policy,
+            self.hits, self.misses, self.evictions)
+
+
+def cached_heuristic(fn):
+    """Decorator for a heuristic method h(self, node) of a Problem. Values
+    are kept in the problem's h_cache (a HeuristicCache), keyed by the
+    heuristic's name and node.state, so distinct nodes with the same state
+    share one entry."""
+    hname = fn.__name__
+
+    @functools.wraps(fn)
+    def cached_fn(self, node):
+        cache = self.h_cache
+        key = (hname, node.state)
+        value = cache.lookup(key)
+        if value is None:
+            value = cache.store(key, fn(self, node))
+        return value
+
+    return cached_fn
+
+
 def name(obj):
     "Try to find some reasonable name for the object."
     return (getattr(obj, 'name', 0) or getattr(obj, '__name__', 0) or
@@ -525,14 +651,15 @@ class Queue:
         Stack(): A Last In First Out Queue.
         FIFOQueue(): A First In First Out Queue.
         PriorityQueue(order, f): Queue in sorted order (default min-first).
+        IndexedPriorityQueue(order, f): PriorityQueue without duplicates,
+            with decrease-key.
     Each type supports the following methods and functions:
         q.append(item)  -- add an item to the queue
         q.extend(items) -- equivalent to: for item in items: q.append(item)
         q.pop()         -- return the top item from the queue
         len(q)          -- number of items in q (also q.__len())
         item in q       -- does q contain item?
-    Note that isinstance(Stack(), Queue) is false, because we implement stacks
-    as lists.  If Python ever gets interfaces, Queue will be an interface."""
+    If Python ever gets interfaces, Queue will be an interface."""
 
     def __init__(self):
         raise NotImplementedError
@@ -542,38 +669,80 @@ class Queue:
             self.append(item)
 
 
-def Stack():
-    """Return an empty list, suitable as a Last-In-First-Out Queue."""
-    return []
+class Stack(Queue):
+
+    """A Last-In-First-Out Queue.
+
+    MODIFIED FROM AIMA VERSION
+        - A class rather than a plain list, keeping a count of each item
+          stacked so that membership tests are O(1) hash lookups instead of
+          an equality scan of the list. Items must be hashable; search Nodes
+          hash and compare by state.
+    """
+
+    def __init__(self):
+        self.A = []
+        self._A = {}
+
+    def append(self, item):
+        self.A.append(item)
+        self._A[item] = self._A.get(item, 0) + 1
+
+    def __len__(self):
+        return len(self.A)
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def pop(self):
+        e = self.A.pop()
+        if self._A[e] > 1:
+            self._A[e] -= 1
+        else:
+            del self._A[e]
+        return e
+
+    def __contains__(self, item):
+        return item in self._A
 
 
 class FIFOQueue(Queue):
 
-    """A First-In-First-Out Queue."""
+    """A First-In-First-Out Queue.
+
+    MODIFIED FROM AIMA VERSION
+        - Use collections.deque
+        - Keep a count of each item queued, so that membership tests are
+          O(1) hash lookups instead of a copy and scan of the queue. Items
+          must be hashable; search Nodes hash and compare by state.
+    """
 
     def __init__(self):
-        self.A = []
-        self.start = 0
+        self.A = collections.deque()
+        self._A = {}
 
     def append(self, item):
         self.A.append(item)
+        self._A[item] = self._A.get(item, 0) + 1
 
     def __len__(self):
-        return len(self.A) - self.start
+        return len(self.A)
 
     def extend(self, items):
-        self.A.extend(items)
+        for item in items:
+            self.append(item)
 
     def pop(self):
-        e = self.A[self.start]
-        self.start += 1
-        if self.start > 5 and self.start > len(self.A) / 2:
-            self.A = self.A[self.start:]
-            self.start = 0
+        e = self.A.popleft()
+        if self._A[e] > 1:
+            self._A[e] -= 1
+        else:
+            del self._A[e]
         return e
 
     def __contains__(self, item):
-        return item in self.A[self.start:]
+        return item in self._A
 
 
 class PriorityQueue(Queue):
@@ -588,28 +757,137 @@ class PriorityQueue(Queue):
 
     def __init__(self, order=None, f=lambda x: x):
         self.A = []
-        self._A = defaultdict(lambda: 0)
+        self._A = {}
         self.f = f
 
     def append(self, item):
         heapq.heappush(self.A, (self.f(item), item))
-        self._A[item] += 1
+        self._A[item] = self._A.get(item, 0) + 1
 
     def __len__(self):
         return len(self.A)
 
     def pop(self):
         _, item = heapq.heappop(self.A)
-        self._A[item] -= 1
+        if self._A[item] > 1:
+            self._A[item] -= 1
+        else:
+            del self._A[item]
         return item
 
     def __contains__(self, item):
-        return self._A[item] > 0
+        return item in self._A
 
     def __getitem__(self, key):
-        if self._A[key] > 0:
+        if key in self._A:
             return key
 
+
+class IndexedPriorityQueue(Queue):
+    """A binary min-heap (ordered by f) with an index from each item to its
+    position in the heap. Items that compare equal (for search Nodes: nodes
+    with the same state) share one entry, so the queue never holds stale
+    duplicates. Supports:
+        item in q       -- O(1) membership
+        q[item]         -- the stored item equal to item
+        q.update(item)  -- replace the stored item and re-order it
+                           (decrease-key), O(log n)
+        del q[item]     -- remove the stored item, O(log n)"""
+
+    def __init__(self, order=None, f=lambda x: x):
+        self.A = []
+        self.index = {}
+        self.f = f
+
+    def append(self, item):
+        """Add item; if an equal item is already queued, keep whichever of the
+        two has the lower key."""
+        i = self.index.get(item)
+        if i is None:
+            self.A.append((self.f(item), item))
+            self.index[item] = len(self.A) - 1
+            self._sift_down(0, len(self.A) - 1)
+        elif self.f(item) < self.A[i][0]:
+            self.update(item)
+
+    def update(self, item):
+        "Replace the queued item equal to item by item, with its new key."
+        i = self.index[item]
+        del self.index[item]
+        self.index[item] = i
+        self.A[i] = (self.f(item), item)
+        self._sift_down(0, i)
+        self._sift_up(self.index[item])
+
+    def __len__(self):
+        return len(self.A)
+
+    def pop(self):
+        last = self.A.pop()
+        if self.A:
+            _, item = self.A[0]
+            self.A[0] = last
+            self.index[last[1]] = 0
+            self._sift_up(0)
+        else:
+            item = last[1]
+        del self.index[item]
+        return item
+
+    def peek(self):
+        "Return the (key, item) pair that pop would remove next."
+        return self.A[0]
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def __getitem__(self, key):
+        return self.A[self.index[key]][1]
+
+    def __delitem__(self, key):
+        i = self.index.pop(key)
+        last = self.A.pop()
+        if i < len(self.A):
+            self.A[i] = last
+            self.index[last[1]] = i
+            self._sift_down(0, i)
+            self._sift_up(self.index[last[1]])
+
+    # The two sift methods follow heapq's, keeping self.index up to date.
+
+    def _sift_down(self, startpos, pos):
+        A, index = self.A, self.index
+        newitem = A[pos]
+        while pos > startpos:
+            parentpos = (pos - 1) >> 1
+            parent = A[parentpos]
+            if newitem < parent:
+                A[pos] = parent
+                index[parent[1]] = pos
+                pos = parentpos
+                continue
+            break
+        A[pos] = newitem
+        index[newitem[1]] = pos
+
+    def _sift_up(self, pos):
+        A, index = self.A, self.index
+        endpos = len(A)
+        startpos = pos
+        newitem = A[pos]
+        childpos = 2 * pos + 1
+        while childpos < endpos:
+            rightpos = childpos + 1
+            if rightpos < endpos and not A[childpos] < A[rightpos]:
+                childpos = rightpos
+            A[pos] = A[childpos]
+            index[A[pos][1]] = pos
+            pos = childpos
+            childpos = 2 * pos + 1
+        A[pos] = newitem
+        index[newitem[1]] = pos
+        self._sift_down(startpos, pos)
+
 # ______________________________________________________________________________
 # Useful Shorthands
 
@@ -4,21 +4,20 @@ from aimacode.search import (
     Node, breadth_first_search, astar_search, depth_first_graph_search,
     uniform_cost_search, greedy_best_first_graph_search, Problem,
 )
-from aimacode.utils import expr
+from aimacode.utils import expr, HeuristicCache, cached_heuristic
 from lp_utils import (
     FluentState, encode_state, decode_state
 )
 from my_planning_graph import PlanningGraph
 from run_search import run_search
 
-from functools import lru_cache
-
 
 class HaveCakeProblem(Problem):
     def __init__(self, initial: FluentState, goal: list):
         self.state_map = initial.pos + initial.neg
         Problem.__init__(self, encode_state(initial, self.state_map), goal=goal)
         self.actions_list = self.get_actions()
+        self.h_cache = HeuristicCache()
 
     def get_actions(self):
         precond_pos = [expr("Have(Cake)")]
@@ -83,7 +82,7 @@ class HaveCakeProblem(Problem):
         h_const = 1
         return h_const
 
-    @lru_cache(maxsize=8192)
+    @cached_heuristic
     def h_pg_levelsum(self, node: Node):
         # uses the planning graph level-sum heuristic calculated
         # from this node to the goal
@@ -92,7 +91,7 @@ class HaveCakeProblem(Problem):
         pg_levelsum = pg.h_levelsum()
         return pg_levelsum
 
-    @lru_cache(maxsize=8192)
+    @cached_heuristic
     def h_ignore_preconditions(self, node: Node):
         # not implemented
         count = 0
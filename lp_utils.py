@@ -1,3 +1,6 @@
+import hashlib
+import sqlite3
+
 from aimacode.logic import associate
 from aimacode.utils import expr
 
@@ -66,3 +69,113 @@ def decode_state(state: str, fluent_map: list) -> FluentState:
         else:
             fs.neg.append(fluent_map[idx])
     return fs
+
+
+def problem_fingerprint(problem) -> str:
+    """ digest identifying a planning problem's domain, for keying stored
+    heuristic values
+
+    Heuristic values depend on the fluent map, the ground actions and the goal,
+    but not on the initial state, so problems that differ only in their
+    initial state share a fingerprint.
+
+    :param problem: planning problem with state_map, actions_list and goal
+    :return: str hex digest
+    """
+    digest = hashlib.sha1()
+    for fluent in problem.state_map:
+        digest.update("{}\n".format(fluent).encode())
+    for clause in problem.goal:
+        digest.update("goal {}\n".format(clause).encode())
+    for action in problem.actions_list:
+        digest.update("{} {} {} {} {}\n".format(
+            action, action.precond_pos, action.precond_neg,
+            action.effect_add, action.effect_rem).encode())
+    return digest.hexdigest()
+
+
+class HeuristicStore():
+    """ persistent store of heuristic values in a local sqlite file
+
+    Values are keyed by problem fingerprint, heuristic name and encoded state.
+    All values for the fingerprint are preloaded into memory when the store is
+    opened; new values are written back in batches of batch_size (and on
+    flush/close). Several processes may share one file: sqlite serialises the
+    writers, and values already written by another process are kept.
+    """
+
+    def __init__(self, path: str, fingerprint: str, batch_size=256, timeout=30.0):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.values = {}
+        self.pending = {}
+        self.connection = None
+        self.open()
+
+    def open(self):
+        self.connection = sqlite3.connect(self.path, timeout=self.timeout)
+        with self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS h_values ("
+                "fingerprint TEXT, heuristic TEXT, state TEXT, value, "
+                "PRIMARY KEY (fingerprint, heuristic, state)) WITHOUT ROWID")
+        self.preload()
+
+    def preload(self):
+        rows = self.connection.execute(
+            "SELECT heuristic, state, value FROM h_values WHERE fingerprint = ?",
+            (self.fingerprint,))
+        for heuristic, state, value in rows:
+            self.values[(heuristic, state)] = value
+
+    def __len__(self):
+        return len(self.values)
+
+    def get(self, key):
+        """ stored value for key, a (heuristic name, state) tuple, or None """
+        return self.values.get(key)
+
+    def put(self, key, value):
+        if key in self.values:
+            return
+        self.values[key] = value
+        self.pending[key] = value
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """ write pending values to the file """
+        if not self.pending or self.connection is None:
+            return
+        rows = [(self.fingerprint, heuristic, state, value)
+                for (heuristic, state), value in self.pending.items()]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO h_values VALUES (?, ?, ?, ?)", rows)
+        self.pending.clear()
+
+    def close(self):
+        if self.connection is not None:
+            self.flush()
+            self.connection.close()
+            self.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getstate__(self):
+        # a sqlite connection cannot be pickled; reopen it on unpickling
+        state = self.__dict__.copy()
+        state['connection'] = None
+        state['pending'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.open()
@@ -3,18 +3,20 @@ from aimacode.planning import Action
 from aimacode.search import (
     Node, Problem,
 )
-from aimacode.utils import expr
+from aimacode.utils import expr, HeuristicCache, cached_heuristic
 from lp_utils import (
-    FluentState, encode_state, decode_state,
+    FluentState, encode_state, decode_state, HeuristicStore,
+    problem_fingerprint,
 )
 from my_planning_graph import PlanningGraph
 
-from functools import lru_cache
+TF_BITS = str.maketrans('TF', '10')
 
 
 class AirCargoProblem(Problem):
     def __init__(self, cargos, planes, airports, initial: FluentState,
-                 goal: list):
+                 goal: list, cache_size=8192, cache_policy='lru',
+                 h_store=None):
         """
 
         :param cargos: list of str
@@ -27,7 +29,15 @@ class AirCargoProblem(Problem):
             positive and negative literal fluents (as expr) describing
             initial state
         :param goal: list of expr
-            literal fluents required for goal test"""
+            literal fluents required for goal test
+        :param cache_size: int or None
+            maximum number of heuristic values cached per problem (None for
+            an unbounded cache)
+        :param cache_policy: str
+            heuristic cache eviction policy, 'lru' or 'clock'
+        :param h_store: str or None
+            path of a sqlite file in which heuristic values are persisted
+            between runs (see lp_utils.HeuristicStore)"""
         self.state_map = initial.pos + initial.neg
         self.initial_state_TF = encode_state(initial, self.state_map)
         Problem.__init__(self, self.initial_state_TF, goal=goal)
@@ -35,6 +45,10 @@ class AirCargoProblem(Problem):
         self.planes = planes
         self.airports = airports
         self.actions_list = self.get_actions()
+        backing = None
+        if h_store is not None:
+            backing = HeuristicStore(h_store, problem_fingerprint(self))
+        self.h_cache = HeuristicCache(cache_size, cache_policy, backing)
 
     def get_actions(self):
         """
@@ -201,12 +215,107 @@ class AirCargoProblem(Problem):
                 return False
         return True
 
+    def preferred_actions(self, state: str) -> list:
+        """Return the executable actions that add an unsatisfied goal fluent,
+        or a missing precondition of an action that would.  This is a cheap
+        approximation of the "helpful actions" of a relaxed plan, for use
+        with deferred_greedy_best_first_graph_search.
+
+        :param state: str representing state
+        :return: list of Action objects"""
+        pos = set(decode_state(state, self.state_map).pos)
+        targets = set(clause for clause in self.goal if clause not in pos)
+        for action in self.actions_list:
+            if targets.intersection(action.effect_add):
+                targets.update(clause for clause in action.precond_pos
+                               if clause not in pos)
+        return [action for action in self.actions(state)
+                if targets.intersection(action.effect_add)]
+
+    # Regression over partial states, for bidirectional_search.  A partial
+    # state is a pair of ints (mask, value) over the bits of a state, where
+    # bit i (counting from the left of the T/F string) is fluent i of the
+    # state map: the fluents set in mask must have the truth values set in
+    # value.
+
+    def state_bits(self, state: str) -> int:
+        """Return the T/F state string as an int, T bits set"""
+        return int(state.translate(TF_BITS), 2)
+
+    def fluent_masks(self, fluents) -> int:
+        """Return the mask with the bits of the given fluents set"""
+        n = len(self.state_map)
+        if not hasattr(self, 'fluent_index'):
+            self.fluent_index = {f: i for i, f in enumerate(self.state_map)}
+        mask = 0
+        for fluent in fluents:
+            mask |= 1 << (n - 1 - self.fluent_index[fluent])
+        return mask
+
+    def action_masks(self, action: Action) -> tuple:
+        """Return (precond_pos, precond_neg, effect_add, effect_rem) masks of
+        action, computed once per action"""
+        if not hasattr(self, 'action_mask_map'):
+            self.action_mask_map = {}
+        masks = self.action_mask_map.get(action)
+        if masks is None:
+            masks = tuple(self.fluent_masks(fluents) for fluents in (
+                action.precond_pos, action.precond_neg,
+                action.effect_add, action.effect_rem))
+            self.action_mask_map[action] = masks
+        return masks
+
+    def regression_goal(self) -> tuple:
+        mask = self.fluent_masks(self.goal)
+        return (mask, mask)
+
+    def relevant_actions(self, partial: tuple) -> list:
+        """Return the actions that achieve a fluent of partial and do not
+        undo any of them
+
+        :param partial: (mask, value) partial state
+        :return: list of Action objects"""
+        mask, value = partial
+        relevant = []
+        for action in self.actions_list:
+            _, _, add, rem = self.action_masks(action)
+            if (add & mask & ~value) or (rem & value):
+                continue
+            if (add & value) or (rem & mask & ~value):
+                relevant.append(action)
+        return relevant
+
+    def regress(self, partial: tuple, action: Action):
+        """Return the partial state from which action achieves partial, or
+        None if it would require a fluent to be both true and false
+
+        :param partial: (mask, value) partial state
+        :param action: Action relevant to partial
+        :return: (mask, value) partial state or None"""
+        mask, value = partial
+        pre_pos, pre_neg, add, rem = self.action_masks(action)
+        effects = add | rem
+        mask &= ~effects
+        value &= ~effects
+        if (pre_pos & pre_neg) or (value & pre_neg) or (mask & ~value & pre_pos):
+            return None
+        return (mask | pre_pos | pre_neg, value | pre_pos)
+
+    def satisfies(self, state: str, partial: tuple) -> bool:
+        mask, value = partial
+        return self.state_bits(state) & mask == value
+
+    def subsumes(self, partial1: tuple, partial2: tuple) -> bool:
+        mask1, value1 = partial1
+        mask2, value2 = partial2
+        return mask1 & ~mask2 == 0 and value2 & mask1 == value1
+
     def h_1(self, node: Node):
         # note that this is not a true heuristic
         h_const = 1
         return h_const
 
-    @lru_cache(maxsize=8192)
+    @cached_heuristic
     def h_pg_levelsum(self, node: Node):
         """This heuristic uses a planning graph representation of the problem
         state space to estimate the sum of all actions that must be carried
@@ -217,7 +326,7 @@ class AirCargoProblem(Problem):
         pg_levelsum = pg.h_levelsum()
         return pg_levelsum
 
-    @lru_cache(maxsize=8192)
+    @cached_heuristic
     def h_ignore_preconditions(self, node: Node):
         """This heuristic estimates the minimum number of actions that must be
         carried out from the current state in order to satisfy all of the
@@ -228,7 +337,7 @@ class AirCargoProblem(Problem):
         return count
 
 
-def air_cargo_p1() -> AirCargoProblem:
+def air_cargo_p1(**kwargs) -> AirCargoProblem:
     cargos = ['C1', 'C2']
     planes = ['P1', 'P2']
     airports = ['JFK', 'SFO']
@@ -250,7 +359,7 @@ def air_cargo_p1() -> AirCargoProblem:
     goal = [expr('At(C1, JFK)'),
             expr('At(C2, SFO)'),
             ]
-    return AirCargoProblem(cargos, planes, airports, init, goal)
+    return AirCargoProblem(cargos, planes, airports, init, goal, **kwargs)
 
 def cross_product(function, objects1, objects2):
     products = []
@@ -260,7 +369,8 @@ def cross_product(function, objects1, objects2):
     return set(products)
 
 
-def create_problem(cargos, planes, airports, pos_cargos, pos_planes, goals):
+def create_problem(cargos, planes, airports, pos_cargos, pos_planes, goals,
+                   **kwargs):
     all_cargos = cross_product('At', cargos, airports)
     neg_cargos = all_cargos - set(pos_cargos)
 
@@ -283,10 +393,10 @@ def create_problem(cargos, planes, airports, pos_cargos, pos_planes, goals):
             print(type(obj[0]), obj)
 
     init = FluentState(pos, neg)
-    return AirCargoProblem(cargos, planes, airports, init, goals)
+    return AirCargoProblem(cargos, planes, airports, init, goals, **kwargs)
 
 
-def air_cargo_p2() -> AirCargoProblem:
+def air_cargo_p2(**kwargs) -> AirCargoProblem:
     cargos = ['C1', 'C2', 'C3']
     planes = ['P1', 'P2', 'P3']
     airports = ['JFK', 'SFO', 'ATL']
@@ -297,10 +407,10 @@ def air_cargo_p2() -> AirCargoProblem:
     goals = ['At(C1, JFK)', 'At(C2, SFO)', 'At(C3, SFO)']
 
     args = (cargos, planes, airports, pos_cargos, pos_planes, goals)
-    return create_problem(*args)
+    return create_problem(*args, **kwargs)
 
 
-def air_cargo_p3() -> AirCargoProblem:
+def air_cargo_p3(**kwargs) -> AirCargoProblem:
     cargos = ['C1', 'C2', 'C3', 'C4']
     planes = ['P1', 'P2']
     airports = ['JFK', 'SFO', 'ATL', 'ORD']
@@ -311,4 +421,4 @@ def air_cargo_p3() -> AirCargoProblem:
     goals = ['At(C1, JFK)', 'At(C3, JFK)', 'At(C2, SFO)', 'At(C4, SFO)']
 
     args = (cargos, planes, airports, pos_cargos, pos_planes, goals)
-    return create_problem(*args)
\ No newline at end of file
+    return create_problem(*args, **kwargs)
\ No newline at end of file
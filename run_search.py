@@ -4,7 +4,9 @@ from aimacode.search import InstrumentedProblem
 from aimacode.search import (breadth_first_search, astar_search,
     breadth_first_tree_search, depth_first_graph_search, uniform_cost_search,
     greedy_best_first_graph_search, depth_limited_search,
-    recursive_best_first_search)
+    recursive_best_first_search, deferred_greedy_best_first_graph_search,
+    iterative_deepening_astar_search, bidirectional_search, arastar_search,
+    enforced_hill_climbing_search, beam_search)
 from my_air_cargo_problems import air_cargo_p1, air_cargo_p2, air_cargo_p3
 
 PROBLEM_CHOICE_MSG = """
@@ -31,11 +33,18 @@ SEARCHES = [["breadth_first_search", breadth_first_search, ""],
             ['depth_first_graph_search', depth_first_graph_search, ""],
             ['depth_limited_search', depth_limited_search, ""],
             ['uniform_cost_search', uniform_cost_search, ""],
+            ['bidirectional_search', bidirectional_search, ""],
             ['recursive_best_first_search', recursive_best_first_search, 'h_1'],
             ['greedy_best_first_graph_search', greedy_best_first_graph_search, 'h_1'],
+            ['deferred_greedy_best_first_graph_search', deferred_greedy_best_first_graph_search, 'h_ignore_preconditions'],
             ['astar_search', astar_search, 'h_1'],
             ['astar_search', astar_search, 'h_ignore_preconditions'],
             ['astar_search', astar_search, 'h_pg_levelsum'],
+            ['astar_search', astar_search, 'h_ignore_preconditions+h_pg_levelsum'],
+            ['iterative_deepening_astar_search', iterative_deepening_astar_search, 'h_ignore_preconditions'],
+            ['arastar_search', arastar_search, 'h_ignore_preconditions'],
+            ['enforced_hill_climbing_search', enforced_hill_climbing_search, 'h_ignore_preconditions'],
+            ['beam_search', beam_search, 'h_ignore_preconditions'],
             ]
 
 
@@ -54,12 +63,14 @@ def run_search(problem, search_function, parameter=None):
     start = timer()
     ip = PrintableProblem(problem)
     if parameter is not None:
-        node = search_function(ip, parameter)
+        node = search_function(ip, ip.instrument(parameter))
     else:
         node = search_function(ip)
     end = timer()
     print("\nExpansions   Goal Tests   New Nodes")
     print("{}\n".format(ip))
+    ip.print_timings()
+    print()
     show_solution(node, end - start)
     print()
 
@@ -85,7 +96,7 @@ def manual():
                                                " ".join(s_choices)))
 
 
-def main(p_choices, s_choices):
+def main(p_choices, s_choices, cache_size=8192, cache_policy='lru', h_store=None):
 
     problems = [PROBLEMS[i-1] for i in map(int, p_choices)]
     searches = [SEARCHES[i-1] for i in map(int, s_choices)]
@@ -96,9 +107,13 @@ def main(p_choices, s_choices):
             hstring = h if not h else " with {}".format(h)
             print("\nSolving {} using {}{}...".format(pname, sname, hstring))
 
-            _p = p()
-            _h = None if not h else getattr(_p, h)
+            _p = p(cache_size=cache_size, cache_policy=cache_policy,
+                   h_store=h_store)
+            _h = None if not h else [getattr(_p, n) for n in h.split('+')]
+            if _h and len(_h) == 1:
+                _h = _h[0]
             run_search(_p, s, _h)
+            _p.h_cache.flush()
 
 
 def show_solution(node, elapsed_time):
@@ -116,12 +131,20 @@ if __name__=="__main__":
                         help="Specify the indices of the problems to solve as a list of space separated values. Choose from: {!s}".format(list(range(1, len(PROBLEMS)+1))))
     parser.add_argument('-s', '--searches', nargs="+", choices=range(1, len(SEARCHES)+1), type=int, metavar='',
                         help="Specify the indices of the search algorithms to use as a list of space separated values. Choose from: {!s}".format(list(range(1, len(SEARCHES)+1))))
+    parser.add_argument('--cache-size', type=int, default=8192, metavar='N',
+                        help="Maximum number of heuristic values cached per problem (0 for no limit).")
+    parser.add_argument('--cache-policy', choices=['lru', 'clock'], default='lru',
+                        help="Eviction policy of the heuristic cache.")
+    parser.add_argument('--h-store', metavar='FILE',
+                        help="Persist heuristic values between runs in this sqlite file.")
     args = parser.parse_args()
+    cache_args = dict(cache_size=args.cache_size or None, cache_policy=args.cache_policy,
+                      h_store=args.h_store)
 
     if args.manual:
         manual()
     elif args.problems and args.searches:
-        main(list(sorted(set(args.problems))), list(sorted(set((args.searches)))))
+        main(list(sorted(set(args.problems))), list(sorted(set((args.searches)))), **cache_args)
     else:
         print()
         parser.print_help()
@@ -3,8 +3,9 @@ import sys
 parent = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(os.path.join(os.path.dirname(parent), "aimacode"))
 from aimacode.planning import Action
-from aimacode.utils import expr
+from aimacode.utils import expr, HeuristicCache
 from aimacode.search import Node
+import tempfile
 import unittest
 from lp_utils import decode_state
 from my_air_cargo_problems import (
@@ -80,5 +81,49 @@ class TestAirCargoMethods(unittest.TestCase):
         n = Node(self.p1.initial)
         self.assertEqual(self.p1.h_ignore_preconditions(n),2)
 
+class TestHeuristicCache(unittest.TestCase):
+
+    def setUp(self):
+        self.p1 = air_cargo_p1(cache_size=2)
+
+    def test_cache_keyed_by_state(self):
+        self.p1.h_ignore_preconditions(Node(self.p1.initial))
+        self.p1.h_ignore_preconditions(Node(self.p1.initial))
+        self.assertEqual(self.p1.h_cache.misses, 1)
+        self.assertEqual(self.p1.h_cache.hits, 1)
+
+    def test_lru_eviction(self):
+        cache = HeuristicCache(2, 'lru')
+        cache.store('a', 1)
+        cache.store('b', 2)
+        cache.lookup('a')
+        cache.store('c', 3)
+        self.assertEqual(sorted(cache.data), ['a', 'c'])
+        self.assertEqual(cache.evictions, 1)
+
+    def test_clock_eviction(self):
+        cache = HeuristicCache(3, 'clock')
+        for key in 'abc':
+            cache.store(key, key)
+        cache.lookup('a')
+        cache.lookup('c')
+        cache.store('d', 'd')
+        self.assertEqual(sorted(cache.data), ['a', 'c', 'd'])
+        cache.store('e', 'e')
+        self.assertEqual(sorted(cache.data), ['c', 'd', 'e'])
+        self.assertEqual(cache.evictions, 2)
+
+    def test_persistent_store(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'h.db')
+            p1 = air_cargo_p1(h_store=path)
+            p1.h_ignore_preconditions(Node(p1.initial))
+            p1.h_cache.backing.close()
+            p1 = air_cargo_p1(h_store=path)
+            p1.h_ignore_preconditions(Node(p1.initial))
+            self.assertEqual(p1.h_cache.backing_hits, 1)
+            p1.h_cache.backing.close()
+
+
 if __name__ == '__main__':
     unittest.main()
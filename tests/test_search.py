@@ -0,0 +1,209 @@
+import os
+import sys
+parent = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(os.path.dirname(parent), "aimacode"))
+from aimacode.utils import FIFOQueue, IndexedPriorityQueue, Stack
+from aimacode.search import (
+    Node, InstrumentedProblem, astar_search, lazy_astar_search,
+    deferred_greedy_best_first_graph_search, depth_first_graph_search,
+    iterative_deepening_astar_search, TranspositionTable, bidirectional_search,
+    anytime_weighted_astar_search, arastar_search,
+    enforced_hill_climbing_search, beam_search,
+)
+import unittest
+from lp_utils import decode_state
+from my_air_cargo_problems import air_cargo_p1, air_cargo_p2
+
+
+def h_unsatisfied_goals(problem):
+    def h(node):
+        pos = decode_state(node.state, problem.state_map).pos
+        return sum(1 for clause in problem.goal if clause not in pos)
+    return h
+
+
+class TestLazyAstar(unittest.TestCase):
+
+    def setUp(self):
+        self.p1 = air_cargo_p1()
+
+    def test_lazy_astar_optimal(self):
+        stats = {}
+        node = lazy_astar_search(self.p1, [self.p1.h_1, self.p1.h_ignore_preconditions], stats)
+        self.assertEqual(len(node.solution()), 6)
+        self.assertLessEqual(stats['h_ignore_preconditions'], stats['h_1'])
+
+    def test_astar_accepts_heuristic_list(self):
+        ip = InstrumentedProblem(self.p1)
+        node = astar_search(ip, [self.p1.h_1, self.p1.h_ignore_preconditions])
+        self.assertEqual(len(node.solution()), 6)
+
+
+class TestDeferredGreedy(unittest.TestCase):
+
+    def setUp(self):
+        self.p1 = air_cargo_p1()
+
+    def test_deferred_evaluation(self):
+        calls = []
+
+        def h(node):
+            calls.append(node.state)
+            return self.p1.h_1(node)
+        ip = InstrumentedProblem(self.p1)
+        node = deferred_greedy_best_first_graph_search(ip, h)
+        self.assertTrue(self.p1.goal_test(node.state))
+        self.assertEqual(len(calls), ip.succs)
+        self.assertLess(len(calls), ip.states)
+
+    def test_preferred_actions(self):
+        preferred = self.p1.preferred_actions(self.p1.initial)
+        self.assertEqual(sorted(str(a) for a in preferred),
+                         ['Fly(P1, SFO, JFK)', 'Fly(P2, JFK, SFO)',
+                          'Load(C1, P1, SFO)', 'Load(C2, P2, JFK)'])
+        node = deferred_greedy_best_first_graph_search(
+            self.p1, self.p1.h_1, self.p1.preferred_actions)
+        self.assertTrue(self.p1.goal_test(node.state))
+
+
+class TestInstrumentedProblem(unittest.TestCase):
+
+    def test_timings(self):
+        p1 = air_cargo_p1()
+        ip = InstrumentedProblem(p1)
+        astar_search(ip, ip.instrument(p1.h_ignore_preconditions))
+        rows = {row[0]: row for row in ip.timing_table()}
+        self.assertEqual(rows['actions'][1], ip.succs)
+        self.assertEqual(rows['result'][1], ip.states)
+        self.assertEqual(rows['goal_test'][1], ip.goal_tests)
+        self.assertIn('h_ignore_preconditions', rows)
+        self.assertLessEqual(rows['actions'][4], rows['actions'][6])
+
+
+class TestIndexedPriorityQueue(unittest.TestCase):
+
+    def test_decrease_key(self):
+        q = IndexedPriorityQueue(min, lambda n: n.path_cost)
+        for state, cost in [('A', 5), ('B', 3), ('C', 4)]:
+            q.append(Node(state, path_cost=cost))
+        q.append(Node('A', path_cost=7))
+        self.assertEqual(q[Node('A')].path_cost, 5)
+        q.update(Node('A', path_cost=1))
+        self.assertEqual(len(q), 3)
+        self.assertEqual([q.pop().state for _ in range(3)], ['A', 'B', 'C'])
+        self.assertNotIn(Node('A'), q)
+
+    def test_delete(self):
+        q = IndexedPriorityQueue(min, lambda n: n.path_cost)
+        for cost, state in enumerate('ABCDE'):
+            q.append(Node(state, path_cost=cost))
+        del q[Node('B')]
+        self.assertEqual([q.pop().state for _ in range(4)], ['A', 'C', 'D', 'E'])
+
+
+class TestFIFOQueue(unittest.TestCase):
+
+    def test_hashed_membership(self):
+        q = FIFOQueue()
+        q.extend([Node('A'), Node('B'), Node('A')])
+        self.assertIn(Node('A'), q)
+        self.assertEqual(q.pop().state, 'A')
+        self.assertIn(Node('A'), q)
+        q.pop()
+        self.assertEqual(q.pop().state, 'A')
+        self.assertNotIn(Node('A'), q)
+        self.assertEqual(len(q), 0)
+
+
+class TestStack(unittest.TestCase):
+
+    def test_hashed_membership(self):
+        q = Stack()
+        q.extend([Node('A'), Node('B'), Node('A')])
+        self.assertEqual(q.pop().state, 'A')
+        self.assertIn(Node('A'), q)
+        self.assertEqual(q.pop().state, 'B')
+        self.assertEqual(q.pop().state, 'A')
+        self.assertNotIn(Node('A'), q)
+
+    def test_duplicate_check_at_pop(self):
+        p1 = air_cargo_p1()
+        for check in ('push', 'pop'):
+            node = depth_first_graph_search(p1, check)
+            self.assertTrue(p1.goal_test(node.state))
+
+
+class TestIDAstar(unittest.TestCase):
+
+    def test_optimal_with_small_table(self):
+        p1 = air_cargo_p1()
+        node = iterative_deepening_astar_search(p1, p1.h_1, table_size=16)
+        self.assertEqual(len(node.solution()), 6)
+
+    def test_shallow_replacement(self):
+        table = TranspositionTable(1)
+        table.store('A', 2, 0, 1)
+        table.store('B', 3, 0, 1)
+        self.assertIsNotNone(table.lookup('A'))
+        table.store('B', 3, 0, 2)
+        self.assertIsNone(table.lookup('A'))
+        self.assertEqual(table.lookup('B')[1], 3)
+
+
+class TestBidirectional(unittest.TestCase):
+
+    def test_shortest_plan(self):
+        for problem, length in [(air_cargo_p1(), 6), (air_cargo_p2(), 9)]:
+            node = bidirectional_search(problem)
+            self.assertTrue(problem.goal_test(node.state))
+            self.assertEqual(len(node.solution()), length)
+
+    def test_regression(self):
+        p1 = air_cargo_p1()
+        goal = p1.regression_goal()
+        self.assertFalse(p1.satisfies(p1.initial, goal))
+        names = sorted(str(a) for a in p1.relevant_actions(goal))
+        self.assertEqual(names, ['Unload(C1, P1, JFK)', 'Unload(C1, P2, JFK)',
+                                 'Unload(C2, P1, SFO)', 'Unload(C2, P2, SFO)'])
+        partial = p1.regress(goal, p1.relevant_actions(goal)[0])
+        self.assertTrue(p1.subsumes(goal, goal))
+        self.assertFalse(p1.subsumes(goal, partial))
+
+
+class TestAnytimeAstar(unittest.TestCase):
+
+    def test_bounds_improve_to_optimal(self):
+        p2 = air_cargo_p2()
+        results = list(anytime_weighted_astar_search(p2, h_unsatisfied_goals(p2)))
+        bounds = [bound for _, bound in results]
+        self.assertEqual(bounds, sorted(bounds, reverse=True))
+        self.assertEqual(bounds[-1], 1.0)
+        self.assertEqual(len(results[-1][0].solution()), 9)
+
+    def test_time_limit(self):
+        p1 = air_cargo_p1()
+        self.assertIsNone(arastar_search(p1, h_unsatisfied_goals(p1), time_limit=0))
+        node = arastar_search(p1, h_unsatisfied_goals(p1), time_limit=10)
+        self.assertEqual(len(node.solution()), 6)
+
+
+class TestLocalSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.p2 = air_cargo_p2()
+        self.h = h_unsatisfied_goals(self.p2)
+
+    def test_enforced_hill_climbing(self):
+        ip = InstrumentedProblem(self.p2)
+        node = enforced_hill_climbing_search(ip, self.h)
+        self.assertTrue(self.p2.goal_test(node.state))
+        self.assertGreater(ip.succs, 0)
+
+    def test_beam_search(self):
+        node = beam_search(self.p2, self.h, width=20)
+        self.assertTrue(self.p2.goal_test(node.state))
+        self.assertIsNone(beam_search(self.p2, self.h, width=1, max_depth=50))
+
+
+if __name__ == '__main__':
+    unittest.main()